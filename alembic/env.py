@@ -5,14 +5,13 @@ from sqlalchemy import pool
 
 from alembic import context
 
-from app.core.config import get_settings
+from app.core.config import SETTINGS
 from app.db.session import Base
 from app import models 
 
-settings = get_settings()
 
 config = context.config
-config.set_main_option("sqlalchemy.url", settings.database_url.replace("postgresql+asyncpg","postgresql+psycopg2"))
+config.set_main_option("sqlalchemy.url", SETTINGS.database_url.replace("postgresql+asyncpg","postgresql+psycopg2"))
 
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
@@ -0,0 +1,28 @@
+"""index api key hash
+
+Revision ID: 3c5e1a9d2b7f
+Revises: 79207baae1f4
+Create Date: 2026-10-15 09:12:04.118230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c5e1a9d2b7f'
+down_revision: Union[str, Sequence[str], None] = '79207baae1f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_api_keys_key_hash'), 'api_keys', ['key_hash'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_api_keys_key_hash'), table_name='api_keys')
@@ -0,0 +1,28 @@
+"""api keys user active index
+
+Revision ID: 8f4b6d0e3a21
+Revises: 3c5e1a9d2b7f
+Create Date: 2026-10-15 10:02:37.540912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f4b6d0e3a21'
+down_revision: Union[str, Sequence[str], None] = '3c5e1a9d2b7f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_api_keys_user_active', 'api_keys', ['user_id', 'revoked', 'expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_api_keys_user_active', table_name='api_keys')
@@ -0,0 +1,28 @@
+"""wallet number sequence
+
+Revision ID: b41d7c9e5f08
+Revises: 8f4b6d0e3a21
+Create Date: 2026-10-15 21:20:11.204318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41d7c9e5f08'
+down_revision: Union[str, Sequence[str], None] = '8f4b6d0e3a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(sa.schema.CreateSequence(sa.Sequence('wallet_number_seq', maxvalue=999999999999)))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(sa.schema.DropSequence(sa.Sequence('wallet_number_seq')))
@@ -1,43 +1,54 @@
+import httpx
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.config import get_settings
+from app.core.config import SETTINGS
+from app.core.http import http_client_dependency
 from app.db.session import get_session
-from app.schemas.auth import AuthResponse
+from app.schemas.auth import AuthResponse, GoogleAuthURL, GoogleCallbackResponse
 from app.services.auth import AuthService
 from app.services.wallet import WalletService
 from urllib.parse import urlencode
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-@router.get("/google")
-async def initiate_google_login_redirect():
 
-    settings = get_settings()
+def _build_google_auth_url() -> str:
     base = "https://accounts.google.com/o/oauth2/v2/auth"
     params = {
-        "client_id": settings.google_client_id,
-        "redirect_uri": str(settings.google_redirect_uri),
+        "client_id": SETTINGS.google_client_id,
+        "redirect_uri": str(SETTINGS.google_redirect_uri),
         "response_type": "code",
         "scope": "openid email profile",
         "access_type": "offline",
         "prompt": "consent",
     }
-    auth_url = f"{base}?{urlencode(params)}"
-    return {"url": auth_url}
+    return f"{base}?{urlencode(params)}"
+
+
+_GOOGLE_AUTH_URL = _build_google_auth_url()
+
+
+@router.get("/google", response_model=GoogleAuthURL)
+async def initiate_google_login_redirect():
+    return GoogleAuthURL(url=_GOOGLE_AUTH_URL)
 
 
-@router.get("/google/callback",) # response_model=AuthResponse
-async def google_callback(code: str, session: AsyncSession = Depends(get_session)):
-    auth_service = AuthService(session)
+@router.get("/google/callback", response_model=GoogleCallbackResponse)
+async def google_callback(
+    code: str,
+    session: AsyncSession = Depends(get_session),
+    http_client: httpx.AsyncClient = Depends(http_client_dependency),
+):
+    auth_service = AuthService(session, http_client)
     id_token = await auth_service.exchange_code_for_token(code)
     user = await auth_service.get_or_create_user(id_token)
     wallet_service = WalletService(session)
     wallet = await wallet_service.get_wallet_for_user(user)
-    return {"user": AuthResponse(
+    return GoogleCallbackResponse(user=AuthResponse(
         id=user.id,
         email=user.email,
         google_id=user.google_id,
         created_at=user.created_at,
         wallet_id=wallet.id,
-    ), "id_token": id_token}
+    ), id_token=id_token)
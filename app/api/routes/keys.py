@@ -3,13 +3,18 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import get_session
 from app.dependencies.auth import get_authenticated_user
-from app.models import User
+from app.models import APIKey, User
 from app.schemas.api_key import APIKeyCreate, APIKeyOut, APIKeyRevoke, APIKeyRollover, APIKeyWithSecret
 from app.services.api_keys import APIKeyService
 
 router = APIRouter(prefix="/keys", tags=["api_keys"])
 
 
+def _with_secret(api_key: APIKey, raw_key: str) -> APIKeyWithSecret:
+    # The ORM fields are validated once via from_attributes; the secret is just attached.
+    return APIKeyWithSecret.model_construct(**dict(APIKeyOut.model_validate(api_key)), key=raw_key)
+
+
 @router.post("/create", response_model=APIKeyWithSecret)
 async def create_api_key(
     payload: APIKeyCreate,
@@ -23,15 +28,7 @@ async def create_api_key(
         permissions=payload.permissions,
         expiry=payload.expiry,
     )
-    return APIKeyWithSecret(
-        id=api_key.id,
-        name=api_key.name,
-        permissions=api_key.permissions,
-        expires_at=api_key.expires_at,
-        revoked=api_key.revoked,
-        created_at=api_key.created_at,
-        key=raw_key,
-    )
+    return _with_secret(api_key, raw_key)
 
 
 @router.post("/rollover", response_model=APIKeyWithSecret)
@@ -42,15 +39,7 @@ async def rollover_api_key(
 ):
     service = APIKeyService(session)
     api_key, raw_key = await service.rollover(current_user, payload.api_key_id)
-    return APIKeyWithSecret(
-        id=api_key.id,
-        name=api_key.name,
-        permissions=api_key.permissions,
-        expires_at=api_key.expires_at,
-        revoked=api_key.revoked,
-        created_at=api_key.created_at,
-        key=raw_key,
-    )
+    return _with_secret(api_key, raw_key)
 
 
 @router.post("/revoke", response_model=APIKeyOut)
@@ -61,14 +50,9 @@ async def revoke_api_key(
 ):
     service = APIKeyService(session)
     api_key = await service.revoke_key(current_user, payload.api_key_id)
-    return APIKeyOut(
-        id=api_key.id,
-        name=api_key.name,
-        permissions=api_key.permissions,
-        expires_at=api_key.expires_at,
-        revoked=api_key.revoked,
-        created_at=api_key.created_at,
-    )
+    return api_key
+
+
 @router.get("/", response_model=list[APIKeyOut])
 async def list_api_keys(
     current_user: User = Depends(get_authenticated_user),
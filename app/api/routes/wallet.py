@@ -1,10 +1,18 @@
 from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_session
+from app.db.session import AsyncSessionLocal, get_session
 from app.dependencies.auth import AuthContext, require_auth
 from app.schemas.transaction import TransactionOut
-from app.schemas.wallet import DepositRequest, DepositResponse, TransferRequest, TransferResponse, WalletOut
+from app.schemas.wallet import (
+    DepositRequest,
+    DepositResponse,
+    TransferRequest,
+    TransferResponse,
+    WalletOut,
+    WebhookResponse,
+)
+from app.services.paystack import PaystackClient, get_paystack_client
 from app.services.wallet import WalletService
 
 router = APIRouter(prefix="/wallet", tags=["wallet"])
@@ -15,19 +23,24 @@ async def initialize_deposit(
     payload: DepositRequest,
     context: AuthContext = Depends(require_auth("deposit")),
     session: AsyncSession = Depends(get_session),
+    paystack: PaystackClient = Depends(get_paystack_client),
 ):
-    wallet_service = WalletService(session)
+    wallet_service = WalletService(session, paystack)
     result = await wallet_service.initialize_deposit(context.user, payload.amount)
     return DepositResponse(**result)
 
 
-@router.post("/paystack/webhook")
-async def paystack_webhook(request: Request, session: AsyncSession = Depends(get_session)):
-    wallet_service = WalletService(session)
+@router.post("/paystack/webhook", response_model=WebhookResponse)
+async def paystack_webhook(
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    paystack: PaystackClient = Depends(get_paystack_client),
+):
+    wallet_service = WalletService(session, paystack)
     signature = request.headers.get("x-paystack-signature")
     body = await request.body()
     await wallet_service.process_webhook(signature or "", body)
-    return {"status": "processed"}
+    return WebhookResponse(status="processed")
 
 
 @router.get("/deposit/{reference}/status", response_model=TransactionOut)
@@ -35,20 +48,21 @@ async def deposit_status(
     reference: str,
     refresh: bool = True,
     context: AuthContext = Depends(require_auth("read")),
-    session: AsyncSession = Depends(get_session),
+    paystack: PaystackClient = Depends(get_paystack_client),
 ):
-    wallet_service = WalletService(session)
-    transaction = await wallet_service.get_transaction_status(reference, context.user, refresh=refresh)
+    async with AsyncSessionLocal() as session:
+        wallet_service = WalletService(session, paystack)
+        transaction = await wallet_service.get_transaction_status(reference, context.user, refresh=refresh)
     return transaction
 
 
 @router.get("/balance", response_model=WalletOut)
 async def wallet_balance(
     context: AuthContext = Depends(require_auth("read")),
-    session: AsyncSession = Depends(get_session),
 ):
-    wallet_service = WalletService(session)
-    wallet = await wallet_service.get_wallet_for_user(context.user)
+    async with AsyncSessionLocal() as session:
+        wallet_service = WalletService(session)
+        wallet = await wallet_service.get_wallet_for_user(context.user)
     return wallet
 
 
@@ -71,9 +85,9 @@ async def wallet_transfer(
 @router.get("/transactions", response_model=list[TransactionOut])
 async def wallet_transactions(
     context: AuthContext = Depends(require_auth("read")),
-    session: AsyncSession = Depends(get_session),
 ):
-    wallet_service = WalletService(session)
-    wallet = await wallet_service.get_wallet_for_user(context.user)
-    transactions = await wallet_service.get_transactions(wallet)
+    async with AsyncSessionLocal() as session:
+        wallet_service = WalletService(session)
+        wallet = await wallet_service.get_wallet_for_user(context.user)
+        transactions = await wallet_service.get_transactions(wallet)
     return transactions
@@ -1,11 +1,15 @@
-from functools import lru_cache
-from pydantic import AnyHttpUrl, field_validator
+from pydantic import AnyHttpUrl, PositiveInt, field_validator
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     app_name: str = "Wallet Service"
     database_url: str
+    db_pool_size: int = 20
+    db_max_overflow: int = 20
+    db_pool_timeout_seconds: int = 10
+    db_pool_recycle_seconds: int = 1800
+    db_use_null_pool: bool = False
     paystack_secret_key: str
     paystack_base_url: AnyHttpUrl = "https://api.paystack.co"
     paystack_webhook_secret: str
@@ -13,12 +17,16 @@ class Settings(BaseSettings):
     google_client_secret: str
     google_redirect_uri: AnyHttpUrl
     jwt_issuer: str = "accounts.google.com"
+    google_jwks_url: str = "https://www.googleapis.com/oauth2/v3/certs"
+    google_jwks_refresh_seconds: int = 86400
     api_key_limit: int = 10
+    api_key_pepper: str
     default_currency: str = "NGN"
     paystack_verify_interval_seconds: int = 60
     paystack_verify_backoff_seconds: int = 120
     paystack_verify_threshold_attempts: int = 5
     paystack_verify_worker_enabled: bool = True
+    paystack_verify_concurrency: PositiveInt = 10
 
     class Config:
         case_sensitive = False
@@ -33,6 +41,8 @@ class Settings(BaseSettings):
         raise ValueError("Database URL must use PostgreSQL (prod) or sqlite+aiosqlite (testing).")
 
 
-@lru_cache
+SETTINGS: Settings = Settings()
+
+
 def get_settings() -> Settings:
-    return Settings()
+    return SETTINGS
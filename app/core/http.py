@@ -0,0 +1,27 @@
+import httpx
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide pooled client for outbound calls (Paystack, Google OAuth)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=100, max_connections=200),
+            timeout=httpx.Timeout(15.0),
+        )
+    return _client
+
+
+async def http_client_dependency() -> httpx.AsyncClient:
+    # async so FastAPI calls it on the event loop; the lazy creation above is not thread-safe.
+    return get_http_client()
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+import httpx
+import jwt
+
+from app.core.config import SETTINGS
+from app.core.http import get_http_client
+
+# An unknown kid forces a refetch (Google rotates keys), but never more often than this.
+_MIN_REFETCH_SECONDS = 60
+
+_keys: dict[str, jwt.PyJWK] = {}
+# None until the first successful fetch; time.monotonic() has no meaningful zero to compare against.
+_fetched_at: float | None = None
+# Serialises fetches so a burst of tokens with an unseen kid triggers one request, not one each.
+_refresh_lock = asyncio.Lock()
+
+
+async def refresh_google_jwks(http_client: httpx.AsyncClient | None = None) -> None:
+    async with _refresh_lock:
+        await _fetch_google_jwks(http_client)
+
+
+async def get_google_signing_key(kid: str, http_client: httpx.AsyncClient | None = None) -> jwt.PyJWK | None:
+    if _needs_refresh(kid):
+        async with _refresh_lock:
+            # Another request may have refreshed while this one waited for the lock.
+            if _needs_refresh(kid):
+                await _fetch_google_jwks(http_client)
+    return _keys.get(kid)
+
+
+def _needs_refresh(kid: str) -> bool:
+    if _fetched_at is None:
+        return True
+    age = time.monotonic() - _fetched_at
+    return age >= SETTINGS.google_jwks_refresh_seconds or (kid not in _keys and age >= _MIN_REFETCH_SECONDS)
+
+
+async def _fetch_google_jwks(http_client: httpx.AsyncClient | None) -> None:
+    global _keys, _fetched_at
+    response = await (http_client or get_http_client()).get(SETTINGS.google_jwks_url, timeout=10)
+    response.raise_for_status()
+    jwk_set = jwt.PyJWKSet.from_dict(response.json())
+    _keys = {key.key_id: key for key in jwk_set.keys if key.key_id}
+    _fetched_at = time.monotonic()
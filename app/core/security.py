@@ -1,25 +1,30 @@
 import base64
-import os
+import hashlib
+import hmac
 import secrets
-from hashlib import pbkdf2_hmac
+
+from app.core.config import SETTINGS
+
+_API_KEY_PEPPER = SETTINGS.api_key_pepper.encode("utf-8")
 
 
 def generate_api_key() -> str:
     return secrets.token_urlsafe(32)
 
 
-def hash_api_key(key: str, salt: bytes | None = None) -> tuple[str, bytes]:
-    salt = salt or os.urandom(16)
-    dk = pbkdf2_hmac("sha256", key.encode("utf-8"), salt, 100_000)
-    payload = salt + dk
-    return base64.b64encode(payload).decode("utf-8"), salt
+def _api_key_digest(key: str) -> bytes:
+    # Keys are 256-bit random tokens, so a peppered HMAC is enough; PBKDF2-style
+    # stretching only buys anything for low-entropy secrets such as passwords.
+    return hmac.new(_API_KEY_PEPPER, key.encode("utf-8"), hashlib.sha256).digest()
+
+
+def hash_api_key(key: str) -> str:
+    return base64.b64encode(_api_key_digest(key)).decode("utf-8")
 
 
 def verify_api_key(key: str, encoded: str) -> bool:
     try:
-        payload = base64.b64decode(encoded.encode("utf-8"))
+        expected = base64.b64decode(encoded.encode("utf-8"))
     except Exception:
         return False
-    salt, digest = payload[:16], payload[16:]
-    new_digest = pbkdf2_hmac("sha256", key.encode("utf-8"), salt, 100_000)
-    return secrets.compare_digest(digest, new_digest)
+    return hmac.compare_digest(_api_key_digest(key), expected)
@@ -1,20 +1,53 @@
+from typing import TypeVar
+
+from sqlalchemy import inspect, make_url
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, make_transient_to_detached
+from sqlalchemy.pool import NullPool, StaticPool
 
-from app.core.config import get_settings
+from app.core.config import SETTINGS
 
 
-settings = get_settings()
+T = TypeVar("T")
 
 
 class Base(DeclarativeBase):
     pass
 
 
-engine = create_async_engine(settings.database_url, echo=False, future=True)
+def _pool_options() -> dict:
+    url = make_url(SETTINGS.database_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # Each new connection would get its own empty in-memory database; share a single one.
+        return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+    if SETTINGS.db_use_null_pool:
+        # Behind pgbouncer in transaction mode, let the bouncer do the pooling.
+        return {"poolclass": NullPool}
+    return {
+        "pool_size": SETTINGS.db_pool_size,
+        "max_overflow": SETTINGS.db_max_overflow,
+        "pool_timeout": SETTINGS.db_pool_timeout_seconds,
+        "pool_recycle": SETTINGS.db_pool_recycle_seconds,
+        "pool_pre_ping": True,
+    }
+
+
+engine = create_async_engine(SETTINGS.database_url, echo=False, future=True, **_pool_options())
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 
+def detached_copy(instance: T) -> T:
+    """Column-only detached copy of a loaded row, safe to keep across sessions.
+
+    Relationships are left unloaded so a later ``merge(load=False)`` never
+    brings mutable related rows (e.g. a wallet balance) along with it.
+    """
+    mapper = inspect(instance).mapper
+    copy = mapper.class_(**{attr.key: getattr(instance, attr.key) for attr in mapper.column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+
 async def get_session() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
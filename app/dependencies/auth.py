@@ -1,10 +1,13 @@
+import hashlib
+import time
 from dataclasses import dataclass
 from typing import Callable, Optional
 
+from cachetools import TTLCache
 from fastapi import Depends, Header, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_session
+from app.db.session import detached_copy, get_session
 from app.models import APIKey, User
 from app.services.api_keys import APIKeyService
 from app.services.auth import AuthService
@@ -12,7 +15,12 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
-@dataclass
+_TOKEN_CACHE_TTL = 300
+# sha256(token) -> (user, expiry); entries never outlive the token's own `exp` claim.
+_TOKEN_CACHE: TTLCache = TTLCache(maxsize=50_000, ttl=_TOKEN_CACHE_TTL)
+
+
+@dataclass(slots=True)
 class AuthContext:
     user: Optional[User] = None
     api_key: Optional[APIKey] = None
@@ -22,10 +30,8 @@ async def get_authenticated_user(
     bearer: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
     session: AsyncSession = Depends(get_session),
 ) -> User:
-    # token = _extract_bearer_token(authorization)
     token = bearer.credentials if bearer else None
-    auth_service = AuthService(session)
-    return await auth_service.get_or_create_user(token)
+    return await _resolve_token_user(token, session)
 
 
 def require_auth(permission: str | None = None) -> Callable:
@@ -36,23 +42,42 @@ def require_auth(permission: str | None = None) -> Callable:
     ) -> AuthContext:
         token = bearer.credentials if bearer else None
         if token:
-            auth_service = AuthService(session)
-            user = await auth_service.get_or_create_user(token)
-            return AuthContext(user=user)
-
-        if x_api_key:
+            user = await _resolve_token_user(token, session)
+            context = AuthContext(user=user)
+        elif x_api_key:
             service = APIKeyService(session)
-            api_key = await service.authenticate(x_api_key, permission)
-            user = await session.get(User, api_key.user_id)
-            return AuthContext(user=user, api_key=api_key)
+            api_key, user = await service.authenticate(x_api_key, permission)
+            context = AuthContext(user=user, api_key=api_key)
+        else:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication required")
 
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication required")
+        # End the lookup transaction so its pooled connection is free while the handler runs.
+        await session.commit()
+        return context
 
     return dependency
 
 
-def _extract_bearer_token(header: str) -> str:
-    scheme, _, token = header.partition(" ")
-    if scheme.lower() != "bearer" or not token:
-        raise HTTPException(status_code=401, detail="Invalid authorization header")
-    return token.strip()
+async def _resolve_token_user(token: str | None, session: AsyncSession) -> User:
+    auth_service = AuthService(session)
+    if not token:
+        return await auth_service.get_or_create_user(token)
+
+    cache_key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    now = time.time()
+    cached = _TOKEN_CACHE.get(cache_key)
+    if cached is not None:
+        user, expires_at = cached
+        if expires_at > now:
+            return await session.merge(user, load=False)
+        _TOKEN_CACHE.pop(cache_key, None)
+
+    claims = await auth_service.decode_google_token(token)
+    user = await auth_service.get_or_create_user_from_claims(claims)
+    expires_at = now + _TOKEN_CACHE_TTL
+    exp = claims.get("exp")
+    if isinstance(exp, (int, float)):
+        expires_at = min(expires_at, float(exp))
+    if expires_at > now:
+        _TOKEN_CACHE[cache_key] = (detached_copy(user), expires_at)
+    return user
@@ -1,32 +1,61 @@
 import asyncio
 import logging
-from contextlib import suppress
+import threading
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI, Request
 from fastapi.openapi.utils import get_openapi
 from fastapi.responses import JSONResponse
 
 from app.api.routes import get_api_router
-from app.core.config import get_settings
+from app.core.config import SETTINGS
+from app.core.http import close_http_client, get_http_client
+from app.core.jwks import refresh_google_jwks
 from app.db.session import AsyncSessionLocal
 from app.services.wallet import WalletService
 
-settings = get_settings()
 logger = logging.getLogger("wallet.background")
 
-app = FastAPI(title=settings.app_name)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.openapi()
+    get_http_client()
+    tasks = [asyncio.create_task(google_jwks_refresher())]
+    if SETTINGS.paystack_verify_worker_enabled:
+        tasks.append(asyncio.create_task(paystack_verification_worker()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        await close_http_client()
+
+
+app = FastAPI(title=SETTINGS.app_name, lifespan=lifespan)
 app.include_router(get_api_router())
 
 
-@app.get("/health")
+@app.get("/health", response_model=dict[str, str])
 async def health_check():
     return {"status": "ok"}
 
 
+_openapi_lock = threading.Lock()
+
+
 def custom_openapi():
     if app.openapi_schema:
         return app.openapi_schema
+    with _openapi_lock:
+        if not app.openapi_schema:
+            app.openapi_schema = _build_openapi_schema()
+    return app.openapi_schema
+
 
+def _build_openapi_schema() -> dict:
     openapi_schema = get_openapi(
         title=app.title,
         version="1.0.0",
@@ -52,8 +81,7 @@ def custom_openapi():
             operation["security"].append({"BearerAuth": []})
             operation["security"].append({"ApiKeyAuth": []})
 
-    app.openapi_schema = openapi_schema
-    return app.openapi_schema
+    return openapi_schema
 
 
 app.openapi = custom_openapi
@@ -66,7 +94,7 @@ async def unhandled_exception_handler(request: Request, exc: Exception):
 
 
 async def paystack_verification_worker():
-    interval = settings.paystack_verify_interval_seconds
+    interval = SETTINGS.paystack_verify_interval_seconds
     while True:
         try:
             async with AsyncSessionLocal() as session:
@@ -77,16 +105,12 @@ async def paystack_verification_worker():
         await asyncio.sleep(interval if interval > 0 else 60)
 
 
-@app.on_event("startup")
-async def start_verification_worker():
-    if settings.paystack_verify_worker_enabled:
-        app.state.paystack_worker = asyncio.create_task(paystack_verification_worker())
-
-
-@app.on_event("shutdown")
-async def stop_verification_worker():
-    task = getattr(app.state, "paystack_worker", None)
-    if task:
-        task.cancel()
-        with suppress(asyncio.CancelledError):
-            await task
+async def google_jwks_refresher():
+    while True:
+        try:
+            await refresh_google_jwks()
+        except Exception as exc:  # pragma: no cover - background logging
+            logger.warning("Google JWKS refresh failed: %s", exc)
+            await asyncio.sleep(60)
+            continue
+        await asyncio.sleep(SETTINGS.google_jwks_refresh_seconds)
@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, String, func, JSON
+from sqlalchemy import Boolean, DateTime, ForeignKey, Index, String, func, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.session import Base
@@ -11,11 +11,12 @@ if TYPE_CHECKING:
 
 class APIKey(Base):
     __tablename__ = "api_keys"
+    __table_args__ = (Index("ix_api_keys_user_active", "user_id", "revoked", "expires_at"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
     name: Mapped[str] = mapped_column(String(100))
-    key_hash: Mapped[str] = mapped_column(String(255))
+    key_hash: Mapped[str] = mapped_column(String(255), unique=True, index=True)
     permissions: Mapped[list[str]] = mapped_column(JSON, default=list)
     expires_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
     revoked: Mapped[bool] = mapped_column(Boolean, default=False)
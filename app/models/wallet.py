@@ -1,7 +1,9 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, func
+from sqlalchemy import DateTime, ForeignKey, Integer, Sequence, String, func
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.sql.functions import FunctionElement
 
 from app.db.session import Base
 
@@ -10,12 +12,34 @@ if TYPE_CHECKING:
     from app.models.transaction import Transaction
 
 
+wallet_number_seq = Sequence("wallet_number_seq", maxvalue=999_999_999_999, metadata=Base.metadata)
+
+
+class next_wallet_number(FunctionElement):
+    """Twelve-digit wallet number rendered inline into the INSERT."""
+
+    type = String()
+    inherit_cache = True
+
+
+@compiles(next_wallet_number, "postgresql")
+def _next_wallet_number_postgresql(element, compiler, **kw):
+    return "lpad(CAST(nextval('wallet_number_seq') AS TEXT), 12, '0')"
+
+
+@compiles(next_wallet_number)
+def _next_wallet_number_default(element, compiler, **kw):
+    # SQLite (tests) has no sequences; random digits are enough there.
+    return "printf('%012d', abs(random()) % 1000000000000)"
+
+
 class Wallet(Base):
     __tablename__ = "wallets"
+    __mapper_args__ = {"eager_defaults": True}
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), unique=True)
-    wallet_number: Mapped[str] = mapped_column(String(20), unique=True, index=True)
+    wallet_number: Mapped[str] = mapped_column(String(20), unique=True, index=True, default=next_wallet_number())
     balance: Mapped[int] = mapped_column(Integer, default=0)
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
@@ -1,14 +1,14 @@
 from datetime import datetime
-from typing import List
+from typing import List, Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
 from app.schemas.base import ORMModel
 
 
 class APIKeyCreate(BaseModel):
     name: str
     permissions: List[str]
-    expiry: str = Field(pattern="^(1H|1D|1M|1Y)$")
+    expiry: Literal["1H", "1D", "1M", "1Y"]
 
 
 class APIKeyOut(ORMModel):
@@ -1,5 +1,16 @@
+from pydantic import BaseModel
+
 from app.schemas.user import UserOut
 
 
 class AuthResponse(UserOut):
     wallet_id: int
+
+
+class GoogleAuthURL(BaseModel):
+    url: str
+
+
+class GoogleCallbackResponse(BaseModel):
+    user: AuthResponse
+    id_token: str
@@ -1,8 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class ORMModel(BaseModel):
-    class Config:
-        model_config = {
-        "from_attributes": True
-    }
+    model_config = ConfigDict(from_attributes=True, extra="ignore", frozen=True)
@@ -1,6 +1,8 @@
 from datetime import datetime
 from typing import Optional
 
+from pydantic import BaseModel, ConfigDict
+
 from app.schemas.base import ORMModel
 
 
@@ -12,12 +14,9 @@ class WalletOut(ORMModel):
 
 
 class DepositRequest(ORMModel):
-    amount: int
+    model_config = ConfigDict(from_attributes=False)
 
-    class Config:
-        model_config = {
-        "from_attributes": False
-    }
+    amount: int
 
 
 class DepositResponse(ORMModel):
@@ -34,3 +33,7 @@ class TransferRequest(ORMModel):
 class TransferResponse(ORMModel):
     reference: str
     status: str
+
+
+class WebhookResponse(BaseModel):
+    status: str
@@ -1,23 +1,38 @@
 from datetime import datetime, timedelta, timezone
+from types import MappingProxyType
 from typing import Tuple
 
+from cachetools import TTLCache
 from fastapi import HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
 
-from app.core.config import get_settings
-from app.core.security import generate_api_key, hash_api_key, verify_api_key
+from app.core.config import SETTINGS
+from app.core.security import generate_api_key, hash_api_key
+from app.db.session import detached_copy
 from app.models import APIKey, User
 
+# Keyed by the stored key hash; holds column-only (api_key, user) copies. Revocation through this process pops the entry;
+# other workers may keep honouring a revoked key for up to the TTL.
+_AUTH_CACHE: TTLCache = TTLCache(maxsize=10_000, ttl=30)
+
+_EXPIRY_DELTAS = MappingProxyType(
+    {
+        "1H": timedelta(hours=1),
+        "1D": timedelta(days=1),
+        "1M": timedelta(days=30),
+        "1Y": timedelta(days=365),
+    }
+)
+
 
 class APIKeyService:
     VALID_PERMISSIONS = {"read", "deposit", "transfer"}
 
     def __init__(self, session: AsyncSession):
         self.session = session
-        self.settings = get_settings()
 
     async def create_key(self, user: User, *, name: str, permissions: list[str], expiry: str) -> Tuple[APIKey, str]:
         await self._enforce_limit(user.id)
@@ -27,7 +42,7 @@ class APIKeyService:
         expires_at = self._expiry_to_datetime(expiry)
 
         raw_key = generate_api_key()
-        hashed, _ = hash_api_key(raw_key)
+        hashed = hash_api_key(raw_key)
         api_key = APIKey(
             user_id=user.id,
             name=name,
@@ -41,7 +56,8 @@ class APIKeyService:
         except IntegrityError as exc:
             await self.session.rollback()
             raise HTTPException(status_code=400, detail="Could not create API key") from exc
-        await self.session.refresh(api_key)
+        # The id comes back from the flush; created_at is the only server-generated column left.
+        await self.session.refresh(api_key, ["created_at"])
         return api_key, raw_key
 
     async def rollover(self, user: User, api_key_id: int) -> Tuple[APIKey, str]:
@@ -54,7 +70,7 @@ class APIKeyService:
             raise HTTPException(status_code=400, detail="API key not expired")
 
         raw_key = generate_api_key()
-        hashed, _ = hash_api_key(raw_key)
+        hashed = hash_api_key(raw_key)
         ttl = source_key.expires_at - source_key.created_at
         if ttl <= timedelta():
             ttl = timedelta(days=30)
@@ -66,49 +82,57 @@ class APIKeyService:
             expires_at=datetime.now(timezone.utc) + ttl,
         )
         source_key.revoked = True
+        _AUTH_CACHE.pop(source_key.key_hash, None)
         self.session.add(new_key)
         try:
             await self.session.commit()
         except IntegrityError as exc:
             await self.session.rollback()
             raise HTTPException(status_code=400, detail="Could not rollover API key") from exc
-        await self.session.refresh(new_key)
+        await self.session.refresh(new_key, ["created_at"])
         return new_key, raw_key
 
-    async def authenticate(self, raw_key: str, required_permission: str | None = None) -> APIKey:
-        stmt = (
-            select(APIKey)
-            .options(selectinload(APIKey.user))
-            .where(APIKey.revoked.is_(False))
-        )
-        result = await self.session.execute(stmt)
-        now = datetime.now(timezone.utc)
-        for api_key in result.scalars().all():
-            if api_key.expires_at <= now:
-                continue
-            if verify_api_key(raw_key, api_key.key_hash):
-                if required_permission and required_permission not in (api_key.permissions or []):
-                    raise HTTPException(status_code=403, detail="Permission denied")
-                return api_key
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired API key")
+    async def authenticate(self, raw_key: str, required_permission: str | None = None) -> Tuple[APIKey, User]:
+        hashed = hash_api_key(raw_key)
+        cached = _AUTH_CACHE.get(hashed)
+        if cached is not None:
+            api_key = await self.session.merge(cached[0], load=False)
+            user = await self.session.merge(cached[1], load=False)
+        else:
+            stmt = (
+                select(APIKey)
+                .options(selectinload(APIKey.user).selectinload(User.wallet))
+                .where(APIKey.key_hash == hashed, APIKey.revoked.is_(False))
+            )
+            api_key = await self.session.scalar(stmt)
+            user = api_key.user if api_key else None
+            if api_key:
+                _AUTH_CACHE[hashed] = (detached_copy(api_key), detached_copy(user))
+        if not api_key or api_key.revoked or api_key.expires_at <= datetime.now(timezone.utc):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired API key")
+        if required_permission and required_permission not in (api_key.permissions or []):
+            raise HTTPException(status_code=403, detail="Permission denied")
+        return api_key, user
 
     async def _enforce_limit(self, user_id: int) -> None:
-        stmt = select(APIKey).where(APIKey.user_id == user_id, APIKey.revoked.is_(False))
-        result = await self.session.execute(stmt)
-        active = [key for key in result.scalars().all() if key.expires_at > datetime.now(timezone.utc)]
-        if len(active) >= self.settings.api_key_limit:
+        stmt = (
+            select(func.count())
+            .select_from(APIKey)
+            .where(
+                APIKey.user_id == user_id,
+                APIKey.revoked.is_(False),
+                APIKey.expires_at > datetime.now(timezone.utc),
+            )
+        )
+        active = await self.session.scalar(stmt)
+        if active >= SETTINGS.api_key_limit:
             raise HTTPException(status_code=400, detail="Maximum active API keys reached")
 
     def _expiry_to_datetime(self, expiry: str) -> datetime:
-        delta_map = {
-            "1H": timedelta(hours=1),
-            "1D": timedelta(days=1),
-            "1M": timedelta(days=30),
-            "1Y": timedelta(days=365),
-        }
-        if expiry not in delta_map:
+        delta = _EXPIRY_DELTAS.get(expiry)
+        if delta is None:
             raise HTTPException(status_code=400, detail="Invalid expiry option")
-        return datetime.now(timezone.utc) + delta_map[expiry]
+        return datetime.now(timezone.utc) + delta
 
     async def revoke_key(self, user: User, api_key_id: int) -> APIKey:
         api_key = await self.session.get(APIKey, api_key_id)
@@ -118,8 +142,8 @@ class APIKeyService:
             raise HTTPException(status_code=400, detail="API key already revoked")
 
         api_key.revoked = True
+        _AUTH_CACHE.pop(api_key.key_hash, None)
         await self.session.commit()
-        await self.session.refresh(api_key)
         return api_key
 
     async def list_keys(self, user: User) -> list[APIKey]:
@@ -3,35 +3,36 @@ from typing import Any, Dict, Optional
 import httpx
 import jwt
 from fastapi import HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import lambda_stmt, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from app.core.config import get_settings
+from app.core.config import SETTINGS
+from app.core.http import get_http_client
+from app.core.jwks import get_google_signing_key
 from app.models import User, Wallet
-from app.utils.wallet import generate_wallet_number
 
 
 class AuthService:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, http_client: httpx.AsyncClient | None = None):
         self.session = session
-        self.settings = get_settings()
+        self.http = http_client or get_http_client()
 
     async def exchange_code_for_token(self, code: str) -> str:
         payload = {
             "code": code,
-            "client_id": self.settings.google_client_id,
-            "client_secret": self.settings.google_client_secret,
-            "redirect_uri": str(self.settings.google_redirect_uri),
+            "client_id": SETTINGS.google_client_id,
+            "client_secret": SETTINGS.google_client_secret,
+            "redirect_uri": str(SETTINGS.google_redirect_uri),
             "grant_type": "authorization_code",
         }
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://oauth2.googleapis.com/token",
-                    data=payload,
-                    timeout=10,
-                )
+            response = await self.http.post(
+                "https://oauth2.googleapis.com/token",
+                data=payload,
+                timeout=10,
+            )
         except httpx.HTTPError as exc:
             raise HTTPException(status_code=502, detail="Unable to reach Google OAuth") from exc
 
@@ -47,20 +48,29 @@ class AuthService:
             raise HTTPException(status_code=400, detail="Google response missing id_token")
         return id_token
 
-    def decode_google_token(self, token: str) -> Dict[str, Any]:
+    async def decode_google_token(self, token: str) -> Dict[str, Any]:
         try:
+            kid = jwt.get_unverified_header(token).get("kid")
+            signing_key = await get_google_signing_key(kid, self.http) if kid else None
+            if signing_key is None:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Google token")
             payload = jwt.decode(
                 token,
-                options={"verify_signature": False},
-                audience=self.settings.google_client_id,
-                issuer=self.settings.jwt_issuer,
+                key=signing_key,
+                algorithms=["RS256"],
+                audience=SETTINGS.google_client_id,
+                issuer=SETTINGS.jwt_issuer,
             )
         except jwt.PyJWTError as exc:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Google token") from exc
+        except httpx.HTTPError as exc:
+            raise HTTPException(status_code=502, detail="Unable to reach Google") from exc
         return payload
 
     async def get_or_create_user(self, token: str) -> User:
-        payload = self.decode_google_token(token)
+        return await self.get_or_create_user_from_claims(await self.decode_google_token(token))
+
+    async def get_or_create_user_from_claims(self, payload: Dict[str, Any]) -> User:
         google_id = payload.get("sub")
         email = payload.get("email")
         if not google_id or not email:
@@ -70,31 +80,26 @@ class AuthService:
         if user:
             return user
 
-        user = User(email=email, google_id=google_id)
-        self.session.add(user)
-        await self.session.flush()
-        wallet_number = await self._generate_unique_wallet_number()
-        wallet = Wallet(user_id=user.id, wallet_number=wallet_number, balance=0)
-        self.session.add(wallet)
-        try:
-            await self.session.commit()
-        except IntegrityError as exc:
-            await self.session.rollback()
-            raise HTTPException(status_code=409, detail="User already exists") from exc
-        await self.session.refresh(user)
-        return user
-
-    async def _generate_unique_wallet_number(self) -> str:
-        while True:
-            number = generate_wallet_number()
-            result = await self.session.execute(select(Wallet).where(Wallet.wallet_number == number))
-            if not result.scalar_one_or_none():
-                return number
+        # The wallet number comes from wallet_number_seq inside the INSERT. Numbers issued before the
+        # sequence existed can still clash, so take the next value once before reporting a conflict.
+        for attempt in range(2):
+            user = User(email=email, google_id=google_id)
+            user.wallet = Wallet(balance=0)
+            self.session.add(user)
+            try:
+                await self.session.commit()
+            except IntegrityError as exc:
+                await self.session.rollback()
+                if attempt:
+                    raise HTTPException(status_code=409, detail="User already exists") from exc
+                continue
+            return user
 
     async def _get_user_by_google_id(self, google_id: str) -> Optional[User]:
-        result = await self.session.execute(select(User).where(User.google_id == google_id))
+        result = await self.session.execute(
+            lambda_stmt(lambda: select(User).options(selectinload(User.wallet)).where(User.google_id == google_id))
+        )
         return result.scalar_one_or_none()
 
     async def get_user_by_id(self, user_id: int) -> Optional[User]:
-        result = await self.session.execute(select(User).where(User.id == user_id))
-        return result.scalar_one_or_none()
+        return await self.session.get(User, user_id)
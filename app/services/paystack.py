@@ -2,25 +2,34 @@ import hashlib
 import hmac
 
 import httpx
+import orjson
 from fastapi import HTTPException, status
 
-from app.core.config import get_settings
+from app.core.config import SETTINGS
+from app.core.http import get_http_client
+
+# The webhook secret never changes, so derive the HMAC key pads once and copy them per webhook.
+_WEBHOOK_HMAC = hmac.new(SETTINGS.paystack_webhook_secret.encode("utf-8"), digestmod=hashlib.sha512)
+# Paystack shares the pooled client with Google OAuth, so the auth header is passed per call.
+_AUTH_HEADERS = {"Authorization": f"Bearer {SETTINGS.paystack_secret_key}"}
+_JSON_HEADERS = {**_AUTH_HEADERS, "Content-Type": "application/json"}
+_BASE_URL = str(SETTINGS.paystack_base_url).rstrip("/")
 
 
 class PaystackClient:
-    def __init__(self) -> None:
-        self.settings = get_settings()
+    def __init__(self, http_client: httpx.AsyncClient | None = None) -> None:
+        self.http = http_client or get_http_client()
 
     async def initialize_transaction(self, *, email: str, amount: int, reference: str) -> dict:
-        payload = {"email": email, "amount": amount, "reference": reference}
+        # orjson produces the bytes body directly instead of httpx's json.dumps().encode().
+        payload = orjson.dumps({"email": email, "amount": amount, "reference": reference})
         try:
-            async with httpx.AsyncClient(base_url=str(self.settings.paystack_base_url)) as client:
-                response = await client.post(
-                    "/transaction/initialize",
-                    json=payload,
-                    headers=self._headers,
-                    timeout=15,
-                )
+            response = await self.http.post(
+                f"{_BASE_URL}/transaction/initialize",
+                content=payload,
+                headers=_JSON_HEADERS,
+                timeout=15,
+            )
         except httpx.HTTPError as exc:
             raise HTTPException(status_code=502, detail="Unable to reach Paystack") from exc
         data = self._handle_response(response)
@@ -28,12 +37,11 @@ class PaystackClient:
 
     async def verify_transaction(self, reference: str) -> dict:
         try:
-            async with httpx.AsyncClient(base_url=str(self.settings.paystack_base_url)) as client:
-                response = await client.get(
-                    f"/transaction/verify/{reference}",
-                    headers=self._headers,
-                    timeout=10,
-                )
+            response = await self.http.get(
+                f"{_BASE_URL}/transaction/verify/{reference}",
+                headers=_AUTH_HEADERS,
+                timeout=10,
+            )
         except httpx.HTTPError as exc:
             raise HTTPException(status_code=502, detail="Unable to reach Paystack") from exc
         data = self._handle_response(response)
@@ -42,16 +50,13 @@ class PaystackClient:
     def verify_signature(self, body: bytes, signature: str | None) -> bool:
         if not signature:
             return False
-        digest = hmac.new(
-            self.settings.paystack_webhook_secret.encode("utf-8"),
-            msg=body,
-            digestmod=hashlib.sha512,
-        ).hexdigest()
-        return hmac.compare_digest(digest, signature)
-
-    @property
-    def _headers(self) -> dict:
-        return {"Authorization": f"Bearer {self.settings.paystack_secret_key}"}
+        try:
+            expected = bytes.fromhex(signature)
+        except ValueError:
+            return False
+        mac = _WEBHOOK_HMAC.copy()
+        mac.update(body)
+        return hmac.compare_digest(mac.digest(), expected)
 
     def _handle_response(self, response: httpx.Response) -> dict:
         if response.status_code >= 400:
@@ -60,3 +65,8 @@ class PaystackClient:
         if not payload.get("status"):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=payload.get("message"))
         return payload
+
+
+async def get_paystack_client() -> PaystackClient:
+    # async so FastAPI resolves it on the event loop instead of hopping to the threadpool.
+    return PaystackClient(get_http_client())
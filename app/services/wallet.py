@@ -1,27 +1,45 @@
-import json
+import asyncio
+import logging
 import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
+import orjson
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import exists, insert, inspect, lambda_stmt, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 
-from app.core.config import get_settings
+from app.core.config import SETTINGS
 from app.models import Transaction, User, Wallet
 from app.models.transaction import TransactionStatus, TransactionType
 from app.services.paystack import PaystackClient
 
+logger = logging.getLogger("wallet.background")
+
+# Pending deposits loaded (and committed) per round of the verification sweep.
+_RETRY_BATCH_SIZE = 100
+
+
+def _discard(task: asyncio.Task) -> None:
+    task.cancel()
+    # Retrieve the outcome so a call that already failed is not reported as never retrieved.
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
 
 class WalletService:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, paystack: PaystackClient | None = None):
         self.session = session
-        self.paystack = PaystackClient()
-        self.settings = get_settings()
+        self.paystack = paystack or PaystackClient()
 
     async def get_wallet_for_user(self, user: User) -> Wallet:
-        result = await self.session.execute(select(Wallet).where(Wallet.user_id == user.id))
+        # The auth path eager-loads the wallet; only query when it was not.
+        if "wallet" not in inspect(user).unloaded and user.wallet is not None:
+            return user.wallet
+        user_id = user.id
+        result = await self.session.execute(lambda_stmt(lambda: select(Wallet).where(Wallet.user_id == user_id)))
         wallet = result.scalar_one_or_none()
         if wallet:
             return wallet
@@ -32,29 +50,21 @@ class WalletService:
             raise HTTPException(status_code=400, detail="Amount must be positive")
 
         wallet = await self.get_wallet_for_user(user)
-        reference = await self._ensure_unique_reference()
-
-        transaction = Transaction(
-            user_id=user.id,
-            wallet_id=wallet.id,
-            reference=reference,
-            type=TransactionType.deposit,
-            amount=amount,
-            status=TransactionStatus.pending,
+        transaction_id, reference, paystack_call = await self._insert_pending_deposit(
+            user.id, wallet.id, user.email, amount
         )
-        self.session.add(transaction)
-        await self.session.flush()
 
         try:
-            paystack_response = await self.paystack.initialize_transaction(
-                email=user.email,
-                amount=amount,
-                reference=reference,
-            )
+            paystack_response = await paystack_call
         except Exception:
             await self.session.rollback()
             raise
-        transaction.extra_data = paystack_response
+        await self.session.execute(
+            update(Transaction)
+            .where(Transaction.id == transaction_id)
+            .values(extra_data=paystack_response)
+            .execution_options(synchronize_session=False)
+        )
         await self.session.commit()
 
         return {"reference": reference, "authorization_url": paystack_response["authorization_url"]}
@@ -70,7 +80,6 @@ class WalletService:
         await self._attempt_verification(transaction, force=True)
         if transaction.status != TransactionStatus.success:
             raise HTTPException(status_code=400, detail="Paystack verification failed")
-        await self.session.refresh(transaction)
         return transaction
 
     async def process_webhook(self, signature: str, raw_body: bytes) -> None:
@@ -78,8 +87,8 @@ class WalletService:
             raise HTTPException(status_code=400, detail="Invalid Paystack signature")
 
         try:
-            payload = json.loads(raw_body.decode("utf-8"))
-        except json.JSONDecodeError as exc:
+            payload = orjson.loads(raw_body)
+        except orjson.JSONDecodeError as exc:
             raise HTTPException(status_code=400, detail="Invalid webhook payload") from exc
         data = payload.get("data", {})
         reference = data.get("reference")
@@ -100,37 +109,56 @@ class WalletService:
         if recipient_wallet.id == sender_wallet.id:
             raise HTTPException(status_code=400, detail="Cannot transfer to same wallet")
 
-        reference = reference or await self._ensure_unique_reference()
-        existing = await self._get_transaction_by_reference(reference)
-        if existing:
+        if not reference:
+            reference = uuid.uuid4().hex
+        elif await self._reference_exists(reference):
             raise HTTPException(status_code=400, detail="Duplicate reference")
 
-        if sender_wallet.balance < amount:
-            raise HTTPException(status_code=400, detail="Insufficient balance")
-
-        ctx_manager = self.session.begin_nested() if self.session.in_transaction() else self.session.begin()
         try:
-            sender_wallet.balance -= amount
-            recipient_wallet.balance += amount
-            transaction = Transaction(
-                user_id=sender_wallet.user_id,
-                wallet_id=sender_wallet.id,
-                reference=reference,
-                type=TransactionType.transfer,
-                amount=amount,
-                status=TransactionStatus.success,
-                extra_data={
+            # Debit and credit in SQL so the balance check and the write are one atomic statement.
+            sender_balance = await self.session.scalar(
+                update(Wallet)
+                .where(Wallet.id == sender_wallet.id, Wallet.balance >= amount)
+                .values(balance=Wallet.balance - amount)
+                .returning(Wallet.balance)
+                .execution_options(synchronize_session=False)
+            )
+            if sender_balance is None:
+                await self.session.rollback()
+                raise HTTPException(status_code=400, detail="Insufficient balance")
+            recipient_balance = await self.session.scalar(
+                update(Wallet)
+                .where(Wallet.id == recipient_wallet.id)
+                .values(balance=Wallet.balance + amount)
+                .returning(Wallet.balance)
+                .execution_options(synchronize_session=False)
+            )
+            set_committed_value(sender_wallet, "balance", sender_balance)
+            set_committed_value(recipient_wallet, "balance", recipient_balance)
+
+            values = {
+                "user_id": sender_wallet.user_id,
+                "wallet_id": sender_wallet.id,
+                "reference": reference,
+                "type": TransactionType.transfer,
+                "amount": amount,
+                "status": TransactionStatus.success,
+                "extra_data": {
                     "recipient_wallet_id": recipient_wallet.id,
                     "recipient_wallet_number": recipient_wallet.wallet_number,
                 },
-            )
-            self.session.add(transaction)
-            await self.session.flush()  # Flush to get the ID assigned
+            }
+            row = (
+                await self.session.execute(
+                    insert(Transaction).values(**values).returning(Transaction.id, Transaction.created_at)
+                )
+            ).one()
             await self.session.commit()
         except SQLAlchemyError as exc:
             await self.session.rollback()
             raise HTTPException(status_code=500, detail="Transfer failed") from exc
-        return transaction
+        # The row is already written; this instance is only handed back to the caller.
+        return Transaction(id=row.id, created_at=row.created_at, **values)
 
     async def get_transactions(self, wallet: Wallet) -> list[Transaction]:
         result = await self.session.execute(
@@ -144,46 +172,125 @@ class WalletService:
             raise HTTPException(status_code=404, detail="Transaction not found")
         if refresh and transaction.status == TransactionStatus.pending:
             await self._attempt_verification(transaction, force=True)
-            await self.session.refresh(transaction)
         return transaction
 
     async def retry_pending_transactions(self) -> int:
-        stmt = select(Transaction).where(Transaction.status == TransactionStatus.pending)
-        result = await self.session.execute(stmt)
-        transactions = result.scalars().all()
+        # Walk the backlog in id order, one committed batch at a time, so memory and row locks
+        # stay bounded by the batch size however many deposits are pending.
+        now = self._now()
         processed = 0
-        for transaction in transactions:
+        last_id = 0
+        while True:
+            stmt = (
+                select(Transaction)
+                .options(joinedload(Transaction.wallet))
+                .where(Transaction.status == TransactionStatus.pending, Transaction.id > last_id)
+                .order_by(Transaction.id)
+                .limit(_RETRY_BATCH_SIZE)
+            )
+            batch = (await self.session.scalars(stmt)).all()
+            if not batch:
+                return processed
+            last_id = batch[-1].id
+            due = [transaction for transaction in batch if self._is_attempt_due(transaction, now)]
+            if due:
+                processed += await self._verify_batch(due, now)
+
+    async def _verify_batch(self, due: list[Transaction], now: datetime) -> int:
+        # Only the Paystack round trips overlap; the session is still used sequentially.
+        semaphore = asyncio.Semaphore(SETTINGS.paystack_verify_concurrency)
+
+        async def verify(reference: str) -> dict:
+            async with semaphore:
+                return await self.paystack.verify_transaction(reference)
+
+        for transaction in due:
+            self._update_verification_metadata(transaction, now)
+        verifications = await asyncio.gather(
+            *(verify(transaction.reference) for transaction in due), return_exceptions=True
+        )
+
+        processed = 0
+        for transaction, verification in zip(due, verifications):
+            if isinstance(verification, BaseException):
+                continue
+            # One savepoint per row, so a row that cannot be applied neither discards the rest of
+            # the batch nor stalls every later sweep at the same id.
             try:
-                updated = await self._attempt_verification(transaction, force=False)
+                async with self.session.begin_nested():
+                    await self._apply_verification(transaction, verification)
             except Exception:
-                await self.session.rollback()
+                logger.exception("Failed to apply verification for transaction %s", transaction.reference)
                 continue
-            if updated:
-                processed += 1
+            processed += 1
+        await self.session.commit()
         return processed
 
     async def _get_transaction_by_reference(self, reference: str) -> Optional[Transaction]:
-        result = await self.session.execute(select(Transaction).where(Transaction.reference == reference))
+        result = await self.session.execute(
+            lambda_stmt(
+                lambda: select(Transaction)
+                .options(joinedload(Transaction.wallet))
+                .where(Transaction.reference == reference)
+            )
+        )
         return result.scalar_one_or_none()
 
+    async def _reference_exists(self, reference: str) -> bool:
+        return await self.session.scalar(
+            lambda_stmt(lambda: select(exists().where(Transaction.reference == reference)))
+        )
+
     async def _get_wallet_by_number(self, wallet_number: str) -> Optional[Wallet]:
-        result = await self.session.execute(select(Wallet).where(Wallet.wallet_number == wallet_number))
+        result = await self.session.execute(
+            lambda_stmt(lambda: select(Wallet).where(Wallet.wallet_number == wallet_number))
+        )
         return result.scalar_one_or_none()
 
-    async def _ensure_unique_reference(self) -> str:
-        while True:
+    async def _insert_pending_deposit(
+        self, user_id: int, wallet_id: int, email: str, amount: int
+    ) -> tuple[int, str, asyncio.Task]:
+        # uuid4 references practically never collide, so let the unique index catch a clash
+        # rather than probing with a SELECT before every insert. Paystack does not need the row,
+        # so its initialize call is already in flight while the INSERT runs.
+        for attempt in range(2):
             reference = uuid.uuid4().hex
-            existing = await self._get_transaction_by_reference(reference)
-            if not existing:
-                return reference
+            paystack_call = asyncio.create_task(
+                self.paystack.initialize_transaction(email=email, amount=amount, reference=reference)
+            )
+            stmt = (
+                insert(Transaction)
+                .values(
+                    user_id=user_id,
+                    wallet_id=wallet_id,
+                    reference=reference,
+                    type=TransactionType.deposit,
+                    amount=amount,
+                    status=TransactionStatus.pending,
+                )
+                .returning(Transaction.id)
+            )
+            try:
+                transaction_id = await self.session.scalar(stmt)
+            except IntegrityError as exc:
+                _discard(paystack_call)
+                await self.session.rollback()
+                if attempt:
+                    raise HTTPException(status_code=500, detail="Unable to create deposit") from exc
+                continue
+            except BaseException:
+                _discard(paystack_call)
+                raise
+            return transaction_id, reference, paystack_call
 
     async def _attempt_verification(self, transaction: Transaction, *, force: bool) -> bool:
         if transaction.status != TransactionStatus.pending:
             return False
-        if not force and not self._is_attempt_due(transaction):
+        now = self._now()
+        if not force and not self._is_attempt_due(transaction, now):
             return False
 
-        self._update_verification_metadata(transaction)
+        self._update_verification_metadata(transaction, now)
         try:
             verification = await self.paystack.verify_transaction(transaction.reference)
         except HTTPException:
@@ -193,6 +300,11 @@ class WalletService:
             await self.session.rollback()
             raise HTTPException(status_code=502, detail="Unable to verify transaction") from exc
 
+        await self._apply_verification(transaction, verification)
+        await self.session.commit()
+        return True
+
+    async def _apply_verification(self, transaction: Transaction, verification: dict) -> None:
         status = verification.get("status")
         if status == "success":
             await self._apply_success(transaction, verification)
@@ -202,30 +314,45 @@ class WalletService:
         else:
             transaction.extra_data = verification
 
-        await self.session.commit()
-        return True
-
-    def _is_attempt_due(self, transaction: Transaction) -> bool:
+    def _is_attempt_due(self, transaction: Transaction, now: datetime) -> bool:
         last_attempt = transaction.last_verification_attempt
         if not last_attempt:
             return True
         wait_seconds = self._required_wait_seconds(transaction.verification_attempts)
-        return self._now() - last_attempt >= timedelta(seconds=wait_seconds)
+        return now - last_attempt >= timedelta(seconds=wait_seconds)
 
     def _required_wait_seconds(self, attempts: int) -> int:
-        if attempts >= self.settings.paystack_verify_threshold_attempts:
-            return self.settings.paystack_verify_backoff_seconds
-        return self.settings.paystack_verify_interval_seconds
+        if attempts >= SETTINGS.paystack_verify_threshold_attempts:
+            return SETTINGS.paystack_verify_backoff_seconds
+        return SETTINGS.paystack_verify_interval_seconds
 
-    def _update_verification_metadata(self, transaction: Transaction) -> None:
+    def _update_verification_metadata(self, transaction: Transaction, now: datetime) -> None:
         transaction.verification_attempts += 1
-        transaction.last_verification_attempt = self._now()
+        transaction.last_verification_attempt = now
 
     async def _apply_success(self, transaction: Transaction, verification: dict) -> None:
-        wallet = await self.session.get(Wallet, transaction.wallet_id)
-        wallet.balance += transaction.amount
-        transaction.status = TransactionStatus.success
-        transaction.extra_data = verification
+        # Claim the row with a conditional UPDATE so that of two concurrent replays of the same
+        # reference only one moves it out of pending and credits the wallet.
+        claimed = await self.session.scalar(
+            update(Transaction)
+            .where(Transaction.id == transaction.id, Transaction.status == TransactionStatus.pending)
+            .values(status=TransactionStatus.success, extra_data=verification)
+            .returning(Transaction.id)
+            .execution_options(synchronize_session=False)
+        )
+        if claimed is None:
+            await self.session.refresh(transaction, ["status", "extra_data"])
+            return
+        balance = await self.session.scalar(
+            update(Wallet)
+            .where(Wallet.id == transaction.wallet_id)
+            .values(balance=Wallet.balance + transaction.amount)
+            .returning(Wallet.balance)
+            .execution_options(synchronize_session=False)
+        )
+        set_committed_value(transaction, "status", TransactionStatus.success)
+        set_committed_value(transaction, "extra_data", verification)
+        set_committed_value(transaction.wallet, "balance", balance)
 
     @staticmethod
     def _now() -> datetime:
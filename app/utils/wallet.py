@@ -2,4 +2,4 @@ import random
 
 
 def generate_wallet_number() -> str:
-    return "".join(str(random.randint(0, 9)) for _ in range(12))
+    return f"{random.randrange(10**12):012d}"
@@ -0,0 +1,12 @@
+from typing import Any
+
+from uvicorn_worker import UvicornWorker
+
+
+class WalletUvicornWorker(UvicornWorker):
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "access_log": False}
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # Shed load with 503s instead of queueing without bound once a worker is saturated.
+        self.config.limit_concurrency = self.cfg.worker_connections
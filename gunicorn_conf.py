@@ -0,0 +1,10 @@
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "app.workers.WalletUvicornWorker"
+worker_connections = int(os.getenv("WORKER_CONNECTIONS", "1000"))
+keepalive = int(os.getenv("KEEPALIVE_SECONDS", "5"))
+graceful_timeout = 30
+accesslog = None
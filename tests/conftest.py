@@ -1,40 +1,114 @@
-import asyncio
 import os
 
-import pytest
 import pytest_asyncio
+from sqlalchemy import event, insert, select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.schema import CreateIndex, CreateTable
 
-os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./test.db")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
 os.environ.setdefault("PAYSTACK_SECRET_KEY", "psk_test")
 os.environ.setdefault("PAYSTACK_WEBHOOK_SECRET", "whsec_test")
 os.environ.setdefault("GOOGLE_CLIENT_ID", "test-client.apps.googleusercontent.com")
 os.environ.setdefault("GOOGLE_CLIENT_SECRET", "test-secret")
 os.environ.setdefault("GOOGLE_REDIRECT_URI", "https://testserver/auth/google/callback")
 os.environ.setdefault("JWT_ISSUER", "accounts.google.com")
+os.environ.setdefault("API_KEY_PEPPER", "pepper_test")
+os.environ.setdefault("API_KEY_LIMIT", "5")
 
 from app.db.session import AsyncSessionLocal, Base, engine  # noqa: E402
+from app.models import User, Wallet  # noqa: E402
 
 
-@pytest.fixture(scope="session")
-def event_loop():
-    loop = asyncio.new_event_loop()
-    yield loop
-    loop.close()
+if engine.dialect.name == "sqlite":
+    # pysqlite defers BEGIN on its own, which breaks SAVEPOINT; let SQLAlchemy emit it instead.
+    @event.listens_for(engine.sync_engine, "connect")
+    def _disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+
+def _schema_script(dialect) -> str:
+    statements = []
+    for table in Base.metadata.sorted_tables:
+        statements.append(str(CreateTable(table, if_not_exists=True).compile(dialect=dialect)).strip())
+        statements.extend(
+            str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect)) for index in table.indexes
+        )
+    return ";\n".join(statements) + ";"
 
 
 @pytest_asyncio.fixture(scope="session", autouse=True)
 async def prepare_database():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    if engine.dialect.name == "sqlite":
+        # The whole schema in one executescript call rather than a round trip per CREATE.
+        async with engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.executescript(_schema_script(engine.dialect))
+    else:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
     yield
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture(scope="module")
+async def db_connection():
+    # Every session a module opens (including the services' own commits and rollbacks) runs in
+    # savepoints on one connection whose outer transaction is rolled back afterwards.
+    async with engine.connect() as conn:
+        outer = await conn.begin()
+        AsyncSessionLocal.configure(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            yield conn
+        finally:
+            AsyncSessionLocal.configure(bind=engine, join_transaction_mode="conservative_savepoint")
+            await outer.rollback()
 
 
 @pytest_asyncio.fixture
-async def db_session():
+async def db_session(db_connection):
+    savepoint = await db_connection.begin_nested()
+    try:
+        async with AsyncSessionLocal() as session:
+            yield session
+    finally:
+        await savepoint.rollback()
+
+
+SEEDED_BALANCES = {"sender": 10_000, "recipient": 0, "webhook": 0, "retry": 0, "manual": 0}
+
+
+@pytest_asyncio.fixture(scope="module")
+async def seeded_user_ids(db_connection):
+    # Two multi-row INSERTs for all personas; the wallet number comes from the column default.
     async with AsyncSessionLocal() as session:
-        yield session
-        for table in reversed(Base.metadata.sorted_tables):
-            await session.execute(table.delete())
+        user_ids = (
+            await session.scalars(
+                insert(User).returning(User.id, sort_by_parameter_order=True),
+                [{"email": f"{name}@example.com", "google_id": f"gid-{name}"} for name in SEEDED_BALANCES],
+            )
+        ).all()
+        await session.execute(
+            insert(Wallet),
+            [
+                {"user_id": user_id, "balance": balance}
+                for user_id, balance in zip(user_ids, SEEDED_BALANCES.values())
+            ],
+        )
         await session.commit()
+    return dict(zip(SEEDED_BALANCES, user_ids))
+
+
+@pytest_asyncio.fixture
+async def seeded_users(db_session, seeded_user_ids):
+    # {name: (user, wallet)} for the module's seeded personas, loaded into this test's session.
+    result = await db_session.execute(
+        select(User).options(selectinload(User.wallet)).where(User.id.in_(seeded_user_ids.values()))
+    )
+    users = {user.id: user for user in result.scalars()}
+    return {name: (users[user_id], users[user_id].wallet) for name, user_id in seeded_user_ids.items()}
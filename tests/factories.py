@@ -1,14 +1,22 @@
+from sqlalchemy import bindparam, select
+
 from app.models import User, Wallet
 from app.utils.wallet import generate_wallet_number
 
+_BALANCES_BY_ID = select(Wallet.id, Wallet.balance).where(Wallet.id.in_(bindparam("ids", expanding=True)))
+
 
 async def create_user_with_wallet(session, *, email: str, google_id: str, balance: int = 0):
     user = User(email=email, google_id=google_id)
-    session.add(user)
+    wallet = Wallet(user=user, wallet_number=generate_wallet_number(), balance=balance)
+    session.add_all([user, wallet])
+    # One flush inserts both rows; eager_defaults brings back ids and created_at, so no refresh.
+    # Callers that need the rows to outlive the session commit themselves.
     await session.flush()
-    wallet = Wallet(user_id=user.id, wallet_number=generate_wallet_number(), balance=balance)
-    session.add(wallet)
-    await session.commit()
-    await session.refresh(user)
-    await session.refresh(wallet)
     return user, wallet
+
+
+async def get_balances(session, ids) -> dict[int, int]:
+    # Plain column rows read straight from the database, bypassing the identity map.
+    result = await session.execute(_BALANCES_BY_ID, {"ids": list(ids)})
+    return dict(result.all())
@@ -63,3 +63,26 @@ async def test_api_key_permission_required(db_session):
     with pytest.raises(HTTPException) as excinfo:
         await service.authenticate(secret, required_permission="transfer")
     assert excinfo.value.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_revoked_api_key_rejected_despite_auth_cache(db_session):
+    user, _ = await create_user_with_wallet(
+        db_session, email="revoke@example.com", google_id="gid-revoke", balance=0
+    )
+    service = APIKeyService(db_session)
+    api_key, secret = await service.create_key(
+        user,
+        name="cached",
+        permissions=["read"],
+        expiry="1D",
+    )
+
+    authenticated, owner = await service.authenticate(secret, required_permission="read")
+    assert authenticated.id == api_key.id
+    assert owner.id == user.id
+
+    await service.revoke_key(user, api_key.id)
+    with pytest.raises(HTTPException) as excinfo:
+        await service.authenticate(secret, required_permission="read")
+    assert excinfo.value.status_code == 401
@@ -1,6 +1,15 @@
+import asyncio
+import json
+
+import httpx
+import jwt
 import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
 from sqlalchemy import select
 
+from app.core import jwks
+from app.core.config import get_settings
 from app.models import Wallet
 from app.services.auth import AuthService
 
@@ -8,11 +17,18 @@ from app.services.auth import AuthService
 @pytest.mark.asyncio
 async def test_google_login_creates_user_and_wallet(db_session, monkeypatch):
     payload = {"sub": "gid-123", "email": "new-user@example.com"}
-    monkeypatch.setattr(AuthService, "decode_google_token", lambda self, token: payload)
+
+    async def fake_decode(self, token):
+        return payload
+
+    monkeypatch.setattr(AuthService, "decode_google_token", fake_decode)
 
     service = AuthService(db_session)
     user = await service.get_or_create_user("token")
     assert user.id is not None
+    # server-generated columns come back with the INSERT
+    assert user.created_at is not None
+    assert user.wallet.wallet_number
 
     wallet_result = await db_session.execute(select(Wallet).where(Wallet.user_id == user.id))
     wallet = wallet_result.scalar_one()
@@ -21,3 +37,56 @@ async def test_google_login_creates_user_and_wallet(db_session, monkeypatch):
     # second login returns same user
     same_user = await service.get_or_create_user("token")
     assert same_user.id == user.id
+
+
+@pytest.mark.asyncio
+async def test_decode_google_token_verifies_signature_against_jwks(db_session, monkeypatch):
+    monkeypatch.setattr(jwks, "_fetched_at", None)
+    settings = get_settings()
+    signing_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(signing_key.public_key()))
+    jwk.update(kid="test-kid", alg="RS256", use="sig")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"keys": [jwk]})
+
+    claims = {
+        "sub": "gid-jwks",
+        "email": "jwks@example.com",
+        "aud": settings.google_client_id,
+        "iss": settings.jwt_issuer,
+    }
+    token = jwt.encode(claims, signing_key, algorithm="RS256", headers={"kid": "test-kid"})
+    forged = jwt.encode(
+        claims,
+        rsa.generate_private_key(public_exponent=65537, key_size=2048),
+        algorithm="RS256",
+        headers={"kid": "test-kid"},
+    )
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http_client:
+        service = AuthService(db_session, http_client)
+        assert (await service.decode_google_token(token))["sub"] == "gid-jwks"
+        with pytest.raises(HTTPException) as exc:
+            await service.decode_google_token(forged)
+    assert exc.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_unknown_kid_burst_fetches_jwks_once(monkeypatch):
+    monkeypatch.setattr(jwks, "_fetched_at", None)
+    monkeypatch.setattr(jwks, "_keys", {})
+    public_key = rsa.generate_private_key(public_exponent=65537, key_size=2048).public_key()
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(public_key))
+    jwk.update(kid="current-kid", alg="RS256", use="sig")
+    fetches = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        fetches.append(request)
+        return httpx.Response(200, json={"keys": [jwk]})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http_client:
+        keys = await asyncio.gather(*(jwks.get_google_signing_key("unseen", http_client) for _ in range(5)))
+
+    assert keys == [None] * 5
+    assert len(fetches) == 1
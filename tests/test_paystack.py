@@ -0,0 +1,65 @@
+import hashlib
+import hmac
+
+import httpx
+import orjson
+import pytest
+
+from app.core.config import get_settings
+from app.services.paystack import PaystackClient
+
+
+def _sign(body: bytes) -> str:
+    secret = get_settings().paystack_webhook_secret.encode("utf-8")
+    return hmac.new(secret, msg=body, digestmod=hashlib.sha512).hexdigest()
+
+
+def test_verify_signature_accepts_valid_signature():
+    client = PaystackClient()
+    body = b'{"event":"charge.success","data":{"reference":"ref-1"}}'
+    assert client.verify_signature(body, _sign(body))
+    # the cached HMAC state must not leak between calls
+    assert client.verify_signature(body, _sign(body))
+
+
+def test_verify_signature_rejects_tampered_or_missing_signature():
+    client = PaystackClient()
+    body = b'{"event":"charge.success","data":{"reference":"ref-1"}}'
+    assert not client.verify_signature(body + b" ", _sign(body))
+    assert not client.verify_signature(body, None)
+    assert not client.verify_signature(body, "not-a-signature")
+
+
+@pytest.mark.asyncio
+async def test_verify_transaction_uses_injected_http_client():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json={"status": True, "data": {"status": "success", "reference": "ref-2"}})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http_client:
+        client = PaystackClient(http_client)
+        data = await client.verify_transaction("ref-2")
+
+    assert data["status"] == "success"
+    assert seen[0].url == "https://api.paystack.co/transaction/verify/ref-2"
+    assert seen[0].headers["Authorization"] == f"Bearer {get_settings().paystack_secret_key}"
+
+
+@pytest.mark.asyncio
+async def test_initialize_transaction_posts_json_body():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json={"status": True, "data": {"authorization_url": "https://paystack.test/pay"}})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http_client:
+        data = await PaystackClient(http_client).initialize_transaction(
+            email="payer@example.com", amount=1500, reference="ref-3"
+        )
+
+    assert data["authorization_url"] == "https://paystack.test/pay"
+    assert seen[0].headers["Content-Type"] == "application/json"
+    assert orjson.loads(seen[0].content) == {"email": "payer@example.com", "amount": 1500, "reference": "ref-3"}
@@ -1,128 +1,229 @@
-import json
+from types import SimpleNamespace
+from unittest.mock import patch
 
 import pytest
-from sqlalchemy import select
+from fastapi import HTTPException
+from sqlalchemy import bindparam, func, select
 
 from app.db.session import AsyncSessionLocal
-from app.models import Transaction, User, Wallet
+from app.models import Transaction, Wallet
 from app.models.transaction import TransactionStatus
 from app.services.paystack import PaystackClient
 from app.services.wallet import WalletService
-from tests.factories import create_user_with_wallet
+from tests.factories import get_balances
+
+WEBHOOK_TEMPLATE = b'{"event":"charge.success","data":{"reference":"%b"}}'
+
+# Built once with bound parameters so every parametrization reuses the same cached compilation.
+TRANSACTION_BY_REFERENCE = select(Transaction).where(Transaction.reference == bindparam("reference"))
+SUCCESSFUL_BY_REFERENCE = (
+    select(func.count())
+    .select_from(Transaction)
+    .where(Transaction.reference == bindparam("reference"), Transaction.status == TransactionStatus.success)
+)
+BALANCE_BY_USER = select(Wallet.balance).where(Wallet.user_id == bindparam("user_id"))
+
+
+# Responses are memoised per reference so repeated calls hand back the same dict; the service
+# only reads them.
+_initialize_responses: dict[str, dict] = {}
+_verify_responses: dict[str, dict] = {}
 
 
 async def fake_initialize_transaction(self, *, email: str, amount: int, reference: str):
-    return {
-        "authorization_url": f"https://paystack.test/pay/{reference}",
-        "reference": reference,
-        "amount": amount,
-        "email": email,
-    }
+    response = _initialize_responses.get(reference)
+    if response is None:
+        response = _initialize_responses[reference] = {
+            "authorization_url": f"https://paystack.test/pay/{reference}",
+            "reference": reference,
+            "amount": amount,
+            "email": email,
+        }
+    return response
 
 
 async def fake_verify_transaction(self, reference: str):
-    return {"status": "success", "reference": reference}
+    response = _verify_responses.get(reference)
+    if response is None:
+        response = _verify_responses[reference] = {"status": "success", "reference": reference}
+    return response
 
 
 def always_valid_signature(self, body: bytes, signature: str | None) -> bool:
     return True
 
 
+@pytest.fixture(scope="module", autouse=True)
+def fake_paystack():
+    with (
+        patch.object(PaystackClient, "initialize_transaction", fake_initialize_transaction),
+        patch.object(PaystackClient, "verify_transaction", fake_verify_transaction),
+        patch.object(PaystackClient, "verify_signature", always_valid_signature),
+    ):
+        yield
+    _initialize_responses.clear()
+    _verify_responses.clear()
+
+
+DEPOSIT_AMOUNT = 1500
+
+
+async def assert_pending(service, session, user, deposit):
+    assert "authorization_url" in deposit
+    result = await session.execute(TRANSACTION_BY_REFERENCE, {"reference": deposit["reference"]})
+    transaction = result.scalar_one()
+    assert transaction.status == TransactionStatus.pending
+
+
+async def assert_retry_success(service, session, user, deposit):
+    assert await service.retry_pending_transactions() == 1
+    transaction = await service.get_transaction_status(deposit["reference"], user)
+    assert transaction.status == TransactionStatus.success
+
+
+async def assert_refresh_success(service, session, user, deposit):
+    transaction = await service.get_transaction_status(deposit["reference"], user, refresh=True)
+    assert transaction.status == TransactionStatus.success
+
+
+async def assert_webhook_idempotent(service, session, user, deposit):
+    payload = WEBHOOK_TEMPLATE % deposit["reference"].encode()
+
+    async with AsyncSessionLocal() as late_session:
+        # A second delivery that loaded the row while it was still pending races the first one.
+        late_service = WalletService(late_session)
+        stale = await late_service.get_transaction_status(deposit["reference"], user)
+        await service.process_webhook(signature="sig", raw_body=payload)
+        assert stale.status == TransactionStatus.pending
+        assert await late_service.verify_and_credit(deposit["reference"]) is stale
+        assert stale.status == TransactionStatus.success
+    await service.process_webhook(signature="sig", raw_body=payload)
+
+    assert await session.scalar(SUCCESSFUL_BY_REFERENCE, {"reference": deposit["reference"]}) == 1
+    assert await session.scalar(BALANCE_BY_USER, {"user_id": user.id}) == DEPOSIT_AMOUNT
+
+
+DEPOSIT_FLOWS = [
+    pytest.param(assert_pending, id="pending"),
+    pytest.param(assert_retry_success, id="retry"),
+    pytest.param(assert_refresh_success, id="refresh"),
+    pytest.param(assert_webhook_idempotent, id="webhook"),
+]
+
+
 @pytest.mark.asyncio
-async def test_initialize_deposit_records_pending_transaction(db_session, monkeypatch):
-    monkeypatch.setattr(PaystackClient, "initialize_transaction", fake_initialize_transaction, raising=False)
-    user, _ = await create_user_with_wallet(
-        db_session, email="wallet@test.com", google_id="gid-wallet", balance=0
-    )
+@pytest.mark.parametrize("check", DEPOSIT_FLOWS)
+async def test_deposit_flows(db_session, seeded_users, check):
+    user, _ = seeded_users["manual"]
     service = WalletService(db_session)
+    deposit = await service.initialize_deposit(user, DEPOSIT_AMOUNT)
 
-    result = await service.initialize_deposit(user, 1500)
-    assert "reference" in result and "authorization_url" in result
+    await check(service, db_session, user, deposit)
 
-    stmt = select(Transaction).where(Transaction.reference == result["reference"])
-    transaction = (await db_session.execute(stmt)).scalar_one()
-    assert transaction.status == TransactionStatus.pending
+
+@pytest.mark.asyncio
+async def test_initialize_deposit_retries_reference_collision(db_session, seeded_users, monkeypatch):
+    user, _ = seeded_users["manual"]
+    references = iter(["a" * 32, "a" * 32, "b" * 32])
+    monkeypatch.setattr("app.services.wallet.uuid.uuid4", lambda: SimpleNamespace(hex=next(references)))
+    service = WalletService(db_session)
+
+    first = await service.initialize_deposit(user, 500)
+    second = await service.initialize_deposit(user, 700)
+
+    assert first["reference"] == "a" * 32
+    assert second["reference"] == "b" * 32
 
 
 @pytest.mark.asyncio
-async def test_transfer_moves_funds_atomically(db_session):
-    sender, sender_wallet = await create_user_with_wallet(
-        db_session, email="sender@example.com", google_id="gid-sender", balance=10_000
-    )
-    recipient, recipient_wallet = await create_user_with_wallet(
-        db_session, email="recipient@example.com", google_id="gid-recipient", balance=0
-    )
-    await db_session.commit()
-
-    async with AsyncSessionLocal() as session:
-        service = WalletService(session)
-        sender_wallet = await session.get(Wallet, sender_wallet.id)
-        recipient_wallet = await session.get(Wallet, recipient_wallet.id)
-        await session.commit()
-
-        transaction = await service.transfer(sender_wallet, recipient_wallet.wallet_number, 2500, reference=None)
-        assert transaction.status == TransactionStatus.success
-
-        updated_sender = await session.get(Wallet, sender_wallet.id)
-        updated_recipient = await session.get(Wallet, recipient_wallet.id)
-        assert updated_sender.balance == 7500
-        assert updated_recipient.balance == 2500
+async def test_transfer_moves_funds_atomically(db_session, seeded_users):
+    _, sender_wallet = seeded_users["sender"]
+    _, recipient_wallet = seeded_users["recipient"]
+    sender_wallet_id, recipient_wallet_id = sender_wallet.id, recipient_wallet.id
+    service = WalletService(db_session)
+
+    transaction = await service.transfer(sender_wallet, recipient_wallet.wallet_number, 2500, reference=None)
+    assert transaction.status == TransactionStatus.success
+
+    balances = await get_balances(db_session, [sender_wallet_id, recipient_wallet_id])
+    assert balances == {sender_wallet_id: 7500, recipient_wallet_id: 2500}
 
 
 @pytest.mark.asyncio
-async def test_webhook_processing_is_idempotent(db_session, monkeypatch):
-    monkeypatch.setattr(PaystackClient, "initialize_transaction", fake_initialize_transaction, raising=False)
-    monkeypatch.setattr(PaystackClient, "verify_transaction", fake_verify_transaction, raising=False)
-    monkeypatch.setattr(PaystackClient, "verify_signature", always_valid_signature, raising=False)
-    user, _ = await create_user_with_wallet(
-        db_session, email="webhook@example.com", google_id="gid-webhook", balance=0
-    )
-    await db_session.commit()
-
-    async with AsyncSessionLocal() as session:
-        service = WalletService(session)
-        user_obj = await session.get(User, user.id)
-        await session.commit()
-
-        deposit = await service.initialize_deposit(user_obj, 3000)
-        reference = deposit["reference"]
-        payload = json.dumps({"event": "charge.success", "data": {"reference": reference}}).encode()
+async def test_transfer_rejects_duplicate_reference(db_session, seeded_users):
+    _, sender_wallet = seeded_users["sender"]
+    _, recipient_wallet = seeded_users["recipient"]
+    service = WalletService(db_session)
+    await service.transfer(sender_wallet, recipient_wallet.wallet_number, 100, reference="order-42")
 
-        await service.process_webhook(signature="sig", raw_body=payload)
-        wallet = await service.get_wallet_for_user(user_obj)
-        assert wallet.balance == 3000
+    with pytest.raises(HTTPException) as exc:
+        await service.transfer(sender_wallet, recipient_wallet.wallet_number, 100, reference="order-42")
+    assert exc.value.detail == "Duplicate reference"
+    assert sender_wallet.balance == 9_900
 
-        await service.process_webhook(signature="sig", raw_body=payload)
-        wallet_again = await service.get_wallet_for_user(user_obj)
-        assert wallet_again.balance == 3000
+
+@pytest.mark.asyncio
+async def test_transfer_rejects_insufficient_balance(db_session, seeded_users):
+    _, sender_wallet = seeded_users["sender"]
+    _, recipient_wallet = seeded_users["recipient"]
+    sender_wallet_id, recipient_wallet_id = sender_wallet.id, recipient_wallet.id
+    service = WalletService(db_session)
+
+    with pytest.raises(HTTPException) as exc:
+        await service.transfer(sender_wallet, recipient_wallet.wallet_number, 20_000, reference=None)
+    assert exc.value.status_code == 400
+
+    balances = await get_balances(db_session, [sender_wallet_id, recipient_wallet_id])
+    assert balances == {sender_wallet_id: 10_000, recipient_wallet_id: 0}
 
 
 @pytest.mark.asyncio
-async def test_retry_pending_transactions_marks_success(db_session, monkeypatch):
-    monkeypatch.setattr(PaystackClient, "initialize_transaction", fake_initialize_transaction, raising=False)
-    monkeypatch.setattr(PaystackClient, "verify_transaction", fake_verify_transaction, raising=False)
-    user, _ = await create_user_with_wallet(
-        db_session, email="retry@example.com", google_id="gid-retry", balance=0
-    )
+async def test_retry_pending_transactions_skips_failed_verifications(db_session, seeded_users, monkeypatch):
+    user, wallet = seeded_users["retry"]
     service = WalletService(db_session)
-    deposit = await service.initialize_deposit(user, 2000)
+    ok = await service.initialize_deposit(user, 1000)
+    unreachable = await service.initialize_deposit(user, 4000)
+
+    async def flaky_verify_transaction(self, reference: str):
+        if reference == unreachable["reference"]:
+            raise RuntimeError("Paystack timeout")
+        return {"status": "success", "reference": reference}
+
+    monkeypatch.setattr("app.services.paystack.PaystackClient.verify_transaction", flaky_verify_transaction)
+    # one deposit per batch, so the sweep has to page through the backlog
+    monkeypatch.setattr("app.services.wallet._RETRY_BATCH_SIZE", 1)
 
     processed = await service.retry_pending_transactions()
     assert processed == 1
 
-    transaction = await service.get_transaction_status(deposit["reference"], user)
-    assert transaction.status == TransactionStatus.success
+    credited = await service.get_transaction_status(ok["reference"], user)
+    pending = await service.get_transaction_status(unreachable["reference"], user)
+    assert credited.status == TransactionStatus.success
+    assert pending.status == TransactionStatus.pending
+    assert pending.verification_attempts == 1
+    assert wallet.balance == 1000
 
 
 @pytest.mark.asyncio
-async def test_status_refresh_triggers_paystack_check(db_session, monkeypatch):
-    monkeypatch.setattr(PaystackClient, "initialize_transaction", fake_initialize_transaction, raising=False)
-    monkeypatch.setattr(PaystackClient, "verify_transaction", fake_verify_transaction, raising=False)
-    user, _ = await create_user_with_wallet(
-        db_session, email="manual@example.com", google_id="gid-manual", balance=0
-    )
+async def test_retry_pending_transactions_isolates_apply_failures(db_session, seeded_users, monkeypatch):
+    user, wallet = seeded_users["retry"]
     service = WalletService(db_session)
-    deposit = await service.initialize_deposit(user, 1500)
+    poisoned = await service.initialize_deposit(user, 4000)
+    ok = await service.initialize_deposit(user, 1000)
+    apply_verification = WalletService._apply_verification
 
-    transaction = await service.get_transaction_status(deposit["reference"], user, refresh=True)
-    assert transaction.status == TransactionStatus.success
+    async def failing_apply(self, transaction, verification):
+        if transaction.reference == poisoned["reference"]:
+            raise RuntimeError("wallet row missing")
+        await apply_verification(self, transaction, verification)
+
+    monkeypatch.setattr("app.services.wallet.WalletService._apply_verification", failing_apply)
+
+    assert await service.retry_pending_transactions() == 1
+
+    credited = await service.get_transaction_status(ok["reference"], user)
+    stuck = await service.get_transaction_status(poisoned["reference"], user)
+    assert credited.status == TransactionStatus.success
+    assert stuck.status == TransactionStatus.pending
+    assert stuck.verification_attempts == 1
+    assert wallet.balance == 1000